@@ -104,6 +104,11 @@ class CommonArgs(Tap):
     """
     Whether to not cache the RDKit molecule for each SMILES string to reduce memory usage (cached by default).
     """
+    tf32: bool = False
+    """
+    Whether to allow TF32 matrix multiplications and convolutions on GPUs that support them (Ampere or newer),
+    which speeds up the linear layers at slightly reduced precision (requires PyTorch >= 1.7).
+    """
 
     def __init__(self, *args, **kwargs):
         super(CommonArgs, self).__init__(*args, **kwargs)
@@ -198,6 +203,14 @@ class CommonArgs(Tap):
             raise NotImplementedError('Bond descriptors are currently only supported with one molecule '
                                       'per input (i.e., number_of_molecules = 1).')
 
+        # Enable TF32
+        if self.tf32:
+            if not hasattr(torch.backends.cuda, 'matmul'):
+                raise ValueError('TF32 requires PyTorch >= 1.7.')
+
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+
         set_cache_mol(not self.no_cache_mol)
 
 
@@ -321,6 +334,11 @@ class TrainArgs(CommonArgs):
     """Aggregation scheme for atomic vectors into molecular vectors"""
     aggregation_norm: int = 100
     """For norm aggregation, number by which to divide summed up atomic features"""
+    torch_compile: bool = False
+    """
+    Whether to compile the MPN encoder(s) and the FFN with :code:`torch.compile` to fuse their elementwise operations
+    (requires PyTorch >= 2.2).
+    """
 
     # Training arguments
     epochs: int = 30
@@ -494,6 +512,10 @@ class TrainArgs(CommonArgs):
         if self.ffn_hidden_size is None:
             self.ffn_hidden_size = self.hidden_size
 
+        # Validate torch.compile
+        if self.torch_compile and not hasattr(torch.nn.Module, 'compile'):
+            raise ValueError('torch_compile requires PyTorch >= 2.2.')
+
         # Handle MPN variants
         if self.atom_messages and self.undirected:
             raise ValueError('Undirected is unnecessary when using atom_messages '
@@ -564,6 +586,16 @@ class PredictArgs(CommonArgs):
     """Whether to drop all columns from the test data file besides the SMILES columns and the new prediction columns."""
     ensemble_variance: bool = False
     """Whether to calculate the variance of ensembles as a measure of epistemic uncertainty. If True, the variance is saved as an additional column for each target in the preds_path."""
+    inference_precision: Literal['fp32', 'bf16', 'fp16'] = 'fp32'
+    """
+    Precision of the model during inference on a GPU. With :code:`bf16` or :code:`fp16`, the MPN and FFN run under
+    autocast so their matrix multiplications can use tensor cores (requires PyTorch >= 1.10).
+    """
+    cuda_graphs: bool = False
+    """
+    Whether to capture the FFN in a CUDA graph for each batch shape and replay it during inference
+    (requires a GPU and PyTorch >= 1.10).
+    """
 
     @property
     def ensemble_size(self) -> int:
@@ -583,6 +615,14 @@ class PredictArgs(CommonArgs):
             raise ValueError('Found no checkpoints. Must specify --checkpoint_path <path> or '
                              '--checkpoint_dir <dir> containing at least one checkpoint.')
 
+        # Validate inference precision
+        if self.inference_precision != 'fp32' and not hasattr(torch, 'autocast'):
+            raise ValueError('Reduced inference precision requires PyTorch >= 1.10.')
+
+        # Validate CUDA graphs
+        if self.cuda_graphs and not hasattr(torch.cuda, 'graph'):
+            raise ValueError('CUDA graphs require PyTorch >= 1.10.')
+
 
 class InterpretArgs(CommonArgs):
     """:class:`InterpretArgs` includes :class:`CommonArgs` along with additional arguments used for interpreting a trained Chemprop model."""
@@ -1,3 +1,4 @@
+from inspect import signature
 import threading
 from collections import OrderedDict
 from random import Random
@@ -12,6 +13,9 @@ from chemprop.features import get_features_generator
 from chemprop.features import BatchMolGraph, MolGraph
 
 
+# Whether this version of PyTorch's DataLoader supports persistent workers (added in PyTorch 1.7)
+DATALOADER_HAS_PERSISTENT_WORKERS = 'persistent_workers' in signature(DataLoader.__init__).parameters
+
 # Cache of graph featurizations
 CACHE_GRAPH = True
 SMILES_TO_GRAPH: Dict[str, MolGraph] = {}
@@ -289,6 +293,21 @@ class MoleculeDataset(Dataset):
 
         return self._batch_graph
 
+    def pin_memory(self) -> 'MoleculeDataset':
+        r"""
+        Pins the tensors of the cached :class:`~chemprop.features.BatchMolGraph`\ s in page-locked memory.
+
+        This is called by a :class:`MoleculeDataLoader` with :code:`pin_memory=True` on each batch
+        so that the graphs can be copied to a GPU asynchronously.
+
+        :return: The :class:`MoleculeDataset` (self) with its graph tensors pinned.
+        """
+        if self._batch_graph is not None:
+            for batch_graph in self._batch_graph:
+                batch_graph.pin_memory()
+
+        return self
+
     def features(self) -> List[np.ndarray]:
         """
         Returns the features associated with each molecule (if they exist).
@@ -428,21 +447,38 @@ class MoleculeDataset(Dataset):
             self._scaler = StandardScaler(replace_nan_token=replace_nan_token)
             self._scaler.fit(features)
 
+        # Transform the features of all datapoints in one vectorized call and then split them back up,
+        # rather than calling the scaler once per datapoint
         if scale_atom_descriptors and not self._data[0].atom_descriptors is None:
-            for d in self._data:
-                d.set_atom_descriptors(self._scaler.transform(d.raw_atom_descriptors))
+            raw_atom_descriptors = [d.raw_atom_descriptors for d in self._data]
+            for d, atom_descriptors in zip(self._data, self._transform_stacked(raw_atom_descriptors)):
+                d.set_atom_descriptors(atom_descriptors)
         elif scale_atom_descriptors and not self._data[0].atom_features is None:
-            for d in self._data:
-                d.set_atom_features(self._scaler.transform(d.raw_atom_features))
+            raw_atom_features = [d.raw_atom_features for d in self._data]
+            for d, atom_features in zip(self._data, self._transform_stacked(raw_atom_features)):
+                d.set_atom_features(atom_features)
         elif scale_bond_features:
-            for d in self._data:
-                d.set_bond_features(self._scaler.transform(d.raw_bond_features))
+            raw_bond_features = [d.raw_bond_features for d in self._data]
+            for d, bond_features in zip(self._data, self._transform_stacked(raw_bond_features)):
+                d.set_bond_features(bond_features)
         else:
-            for d in self._data:
-                d.set_features(self._scaler.transform(d.raw_features.reshape(1, -1))[0])
+            features = self._scaler.transform(np.vstack([d.raw_features for d in self._data]))
+            for d, f in zip(self._data, features):
+                d.set_features(f)
 
         return self._scaler
 
+    def _transform_stacked(self, arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Transforms a list of 2D arrays with the scaler by stacking them and splitting the result back up.
+
+        :param arrays: A list of 2D numpy arrays (e.g., one array of atom descriptors per molecule).
+        :return: A list of the transformed 2D numpy arrays, in the same order and with the same shapes.
+        """
+        transformed = self._scaler.transform(np.vstack(arrays))
+
+        return np.split(transformed, np.cumsum([len(array) for array in arrays])[:-1])
+
     def normalize_targets(self) -> StandardScaler:
         """
         Normalizes the targets of the dataset using a :class:`~chemprop.data.StandardScaler`.
@@ -578,7 +614,9 @@ class MoleculeDataLoader(DataLoader):
                  num_workers: int = 8,
                  class_balance: bool = False,
                  shuffle: bool = False,
-                 seed: int = 0):
+                 seed: int = 0,
+                 persistent_workers: bool = False,
+                 pin_memory: bool = False):
         """
         :param dataset: The :class:`MoleculeDataset` containing the molecules to load.
         :param batch_size: Batch size.
@@ -589,6 +627,12 @@ class MoleculeDataLoader(DataLoader):
                               subset of the larger class.
         :param shuffle: Whether to shuffle the data.
         :param seed: Random seed. Only needed if shuffle is True.
+        :param persistent_workers: Whether to keep the workers alive between iterations instead of starting
+                                   new ones each time. Only use this if the underlying data (e.g., the scaled
+                                   features) does not change between iterations, since the workers keep
+                                   the copy of the dataset they started with. Ignored before PyTorch 1.7.
+        :param pin_memory: Whether to pin the graph tensors of each batch in page-locked memory
+                           so that they can be copied to a GPU asynchronously.
         """
         self._dataset = dataset
         self._batch_size = batch_size
@@ -596,6 +640,8 @@ class MoleculeDataLoader(DataLoader):
         self._class_balance = class_balance
         self._shuffle = shuffle
         self._seed = seed
+        self._persistent_workers = persistent_workers and num_workers > 0 and DATALOADER_HAS_PERSISTENT_WORKERS
+        self._pin_memory = pin_memory
         self._context = None
         self._timeout = 0
         is_main_thread = threading.current_thread() is threading.main_thread()
@@ -617,7 +663,10 @@ class MoleculeDataLoader(DataLoader):
             num_workers=self._num_workers,
             collate_fn=construct_molecule_batch,
             multiprocessing_context=self._context,
-            timeout=self._timeout
+            timeout=self._timeout,
+            pin_memory=self._pin_memory,
+            # Only passed when enabled since DataLoader rejects it without workers (and before PyTorch 1.7)
+            **({'persistent_workers': True} if self._persistent_workers else {})
         )
 
     @property
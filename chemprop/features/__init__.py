@@ -1,8 +1,8 @@
 from .features_generators import get_available_features_generators, get_features_generator, \
     morgan_binary_features_generator, morgan_counts_features_generator, rdkit_2d_features_generator, \
     rdkit_2d_normalized_features_generator, register_features_generator
-from .featurization import atom_features, bond_features, BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph, \
-    MolGraph, onek_encoding_unk, set_extra_atom_fdim, set_extra_bond_fdim
+from .featurization import atom_features, bond_features, BatchMolGraph, get_atom_fdim, get_bond_fdim, \
+    merge_batch_mol_graphs, mol2graph, MolGraph, onek_encoding_unk, set_extra_atom_fdim, set_extra_bond_fdim
 from .utils import load_features, save_features, load_valid_atom_or_bond_features
 
 __all__ = [
@@ -19,6 +19,7 @@ __all__ = [
     'set_extra_atom_fdim',
     'get_bond_fdim',
     'set_extra_bond_fdim',
+    'merge_batch_mol_graphs',
     'mol2graph',
     'MolGraph',
     'onek_encoding_unk',
@@ -1,5 +1,5 @@
 from typing import List, Tuple, Union
-from itertools import zip_longest
+from itertools import chain, zip_longest
 from rdkit import Chem
 import torch
 import numpy as np
@@ -243,6 +243,8 @@ class BatchMolGraph:
     * :code:`max_num_bonds`: The maximum number of bonds neighboring an atom in this batch.
     * :code:`b2b`: (Optional) A mapping from a bond index to incoming bond indices.
     * :code:`a2a`: (Optional): A mapping from an atom index to neighboring atom indices.
+    * :code:`a2mol`: A mapping from each (non-padding) atom index to the index of its molecule.
+    * :code:`a_sizes`: The number of atoms in each molecule.
     """
 
     def __init__(self, mol_graphs: List[MolGraph]):
@@ -264,35 +266,82 @@ class BatchMolGraph:
         # All start with zero padding so that indexing with zero padding returns zeros
         f_atoms = [[0] * self.atom_fdim]  # atom features
         f_bonds = [[0] * self.bond_fdim]  # combined atom/bond features
-        a2b = [[]]  # mapping from atom index to incoming bond indices
-        b2a = [0]  # mapping from bond index to the index of the atom the bond is coming from
-        b2revb = [0]  # mapping from bond index to the index of the reverse bond
+        a2b_lengths = [0]  # number of incoming bonds for each atom
+        a2b_bonds = []  # incoming bond indices (within their molecule) of all atoms, flattened
+        b2a = [0]  # mapping from bond index to the index (within its molecule) of the atom the bond is coming from
+        b2revb = [0]  # mapping from bond index to the index (within its molecule) of the reverse bond
         for mol_graph in mol_graphs:
             f_atoms.extend(mol_graph.f_atoms)
             f_bonds.extend(mol_graph.f_bonds)
 
-            for a in range(mol_graph.n_atoms):
-                a2b.append([b + self.n_bonds for b in mol_graph.a2b[a]])
-
-            for b in range(mol_graph.n_bonds):
-                b2a.append(self.n_atoms + mol_graph.b2a[b])
-                b2revb.append(self.n_bonds + mol_graph.b2revb[b])
+            a2b_lengths.extend(len(in_bonds) for in_bonds in mol_graph.a2b)
+            a2b_bonds.extend(chain.from_iterable(mol_graph.a2b))
+            b2a.extend(mol_graph.b2a)
+            b2revb.extend(mol_graph.b2revb)
 
             self.a_scope.append((self.n_atoms, mol_graph.n_atoms))
             self.b_scope.append((self.n_bonds, mol_graph.n_bonds))
             self.n_atoms += mol_graph.n_atoms
             self.n_bonds += mol_graph.n_bonds
 
-        self.max_num_bonds = max(1, max(
-            len(in_bonds) for in_bonds in a2b))  # max with 1 to fix a crash in rare case of all single-heavy-atom mols
-
-        self.f_atoms = torch.FloatTensor(f_atoms)
-        self.f_bonds = torch.FloatTensor(f_bonds)
-        self.a2b = torch.LongTensor([a2b[a] + [0] * (self.max_num_bonds - len(a2b[a])) for a in range(self.n_atoms)])
-        self.b2a = torch.LongTensor(b2a)
-        self.b2revb = torch.LongTensor(b2revb)
+        a2b_lengths = np.array(a2b_lengths)
+        # max with 1 to fix a crash in rare case of all single-heavy-atom mols
+        self.max_num_bonds = max(1, int(a2b_lengths.max()))
+
+        # Build the zero-padded a2b matrix in one vectorized step rather than padding each row in Python.
+        # Every bond is incoming to exactly one atom, so each molecule contributes n_bonds entries to a2b_bonds,
+        # which are shifted by the start index of the molecule's bonds. Row-major boolean assignment then fills
+        # the first a2b_lengths[a] slots of each row a in the same order as the flattened list.
+        a_starts, a_sizes = np.array(self.a_scope, dtype=np.int64).reshape(-1, 2).T
+        b_starts, b_sizes = np.array(self.b_scope, dtype=np.int64).reshape(-1, 2).T
+        bond_offsets = np.repeat(b_starts, b_sizes)  # start bond index of the molecule of each bond
+        a2b_bonds = np.array(a2b_bonds, dtype=np.int64) + bond_offsets
+        a2b = np.zeros((self.n_atoms, self.max_num_bonds), dtype=np.int64)
+        a2b[np.arange(self.max_num_bonds) < a2b_lengths[:, None]] = a2b_bonds
+
+        # Likewise shift b2a and b2revb (past the padding bond) by the start atom/bond index of each bond's molecule
+        b2a = np.array(b2a, dtype=np.int64)
+        b2a[1:] += np.repeat(a_starts, b_sizes)
+        b2revb = np.array(b2revb, dtype=np.int64)
+        b2revb[1:] += bond_offsets
+
+        # Converting the nested feature lists with numpy is much faster than with torch.FloatTensor
+        self.f_atoms = torch.from_numpy(np.array(f_atoms, dtype=np.float32))
+        self.f_bonds = torch.from_numpy(np.array(f_bonds, dtype=np.float32))
+        self.a2b = torch.from_numpy(a2b)
+        self.b2a = torch.from_numpy(b2a)
+        self.b2revb = torch.from_numpy(b2revb)
         self.b2b = None  # try to avoid computing b2b b/c O(n_atoms^3)
         self.a2a = None  # only needed if using atom messages
+        # The readout index and molecule sizes are built here on the host since their shapes depend on the data,
+        # which would force a (possibly compiled) forward pass to break its graph and recompile for every batch.
+        # Atoms are stored contiguously by molecule right after the padding atom.
+        self.a2mol = torch.from_numpy(np.repeat(np.arange(len(self.a_scope), dtype=np.int64), a_sizes))  # num_atoms - 1
+        self.a_sizes = torch.from_numpy(a_sizes)  # num_molecules
+
+    def pin_memory(self) -> 'BatchMolGraph':
+        """
+        Pins the tensors of the :class:`BatchMolGraph` in page-locked memory so they can be copied to a GPU asynchronously.
+
+        This is called by a PyTorch :class:`~torch.utils.data.DataLoader` when :code:`pin_memory=True`.
+
+        :return: The :class:`BatchMolGraph` (self) with its tensors pinned.
+        """
+        self.f_atoms = self.f_atoms.pin_memory()
+        self.f_bonds = self.f_bonds.pin_memory()
+        self.a2b = self.a2b.pin_memory()
+        self.b2a = self.b2a.pin_memory()
+        self.b2revb = self.b2revb.pin_memory()
+        self.a2mol = self.a2mol.pin_memory()
+        self.a_sizes = self.a_sizes.pin_memory()
+
+        if self.b2b is not None:
+            self.b2b = self.b2b.pin_memory()
+
+        if self.a2a is not None:
+            self.a2a = self.a2a.pin_memory()
+
+        return self
 
     def get_components(self, atom_messages: bool = False) -> Tuple[torch.FloatTensor, torch.FloatTensor,
                                                                    torch.LongTensor, torch.LongTensor, torch.LongTensor,
@@ -316,9 +365,11 @@ class BatchMolGraph:
                  and scope of the atoms and bonds (i.e., the indices of the molecules they belong to).
         """
         if atom_messages:
+            # The column slice is strided, so make it contiguous for the device copy and the bond feature gathers
             f_bonds = self.f_bonds[:, -get_bond_fdim(atom_messages=atom_messages,
                                                      overwrite_default_atom=self.overwrite_default_atom_features,
                                                      overwrite_default_bond=self.overwrite_default_bond_features):]
+            f_bonds = f_bonds.contiguous()
         else:
             f_bonds = self.f_bonds
 
@@ -333,8 +384,8 @@ class BatchMolGraph:
         if self.b2b is None:
             b2b = self.a2b[self.b2a]  # num_bonds x max_num_bonds
             # b2b includes reverse edge for each bond so need to mask out
-            revmask = (b2b != self.b2revb.unsqueeze(1).repeat(1, b2b.size(1))).long()  # num_bonds x max_num_bonds
-            self.b2b = b2b * revmask
+            revmask = b2b == self.b2revb.unsqueeze(1)  # num_bonds x max_num_bonds (broadcast over neighbors)
+            self.b2b = b2b.masked_fill_(revmask, 0)
 
         return self.b2b
 
@@ -353,6 +404,14 @@ class BatchMolGraph:
 
         return self.a2a
 
+    def get_a2mol(self) -> torch.LongTensor:
+        """
+        Returns a mapping from each atom index (excluding padding) to its molecule index.
+
+        :return: A PyTorch tensor of length :code:`n_atoms - 1` containing the molecule index of each atom.
+        """
+        return self.a2mol
+
 
 def mol2graph(mols: Union[List[str], List[Chem.Mol]],
               atom_features_batch: List[np.array] = None,
@@ -375,3 +434,64 @@ def mol2graph(mols: Union[List[str], List[Chem.Mol]],
                                    overwrite_default_bond_features=overwrite_default_bond_features)
                           for mol, af, bf
                           in zip_longest(mols, atom_features_batch, bond_features_batch)])
+
+
+def merge_batch_mol_graphs(batch_graphs: List[BatchMolGraph]) -> BatchMolGraph:
+    r"""
+    Merges several :class:`BatchMolGraph`\ s into a single :class:`BatchMolGraph`.
+
+    The molecules of the merged graph are ordered first by input graph and then by their order within that graph,
+    so an encoding of the merged graph can be split back into equal chunks, one for each input graph.
+
+    :param batch_graphs: A list of :class:`BatchMolGraph`\ s to merge.
+    :return: A :class:`BatchMolGraph` containing all of the molecules in :code:`batch_graphs`.
+    """
+    first = batch_graphs[0]
+    merged = BatchMolGraph.__new__(BatchMolGraph)
+    merged.overwrite_default_atom_features = first.overwrite_default_atom_features
+    merged.overwrite_default_bond_features = first.overwrite_default_bond_features
+    merged.atom_fdim = first.atom_fdim
+    merged.bond_fdim = first.bond_fdim
+    merged.max_num_bonds = max(graph.max_num_bonds for graph in batch_graphs)
+
+    # Keep a single zero padding row and drop the padding row of every graph being merged
+    f_atoms, f_bonds = [first.f_atoms[:1]], [first.f_bonds[:1]]
+    a2b = [torch.zeros((1, merged.max_num_bonds), dtype=torch.long)]
+    b2a, b2revb = [torch.zeros(1, dtype=torch.long)], [torch.zeros(1, dtype=torch.long)]
+    merged.a_scope, merged.b_scope = [], []
+    a2mol, a_sizes = [], []
+    merged.n_atoms = merged.n_bonds = 1
+
+    for graph in batch_graphs:
+        atom_offset, bond_offset = merged.n_atoms - 1, merged.n_bonds - 1
+        mol_offset = len(merged.a_scope)
+
+        f_atoms.append(graph.f_atoms[1:])
+        f_bonds.append(graph.f_bonds[1:])
+
+        # Shift the bond indices in a2b but leave the zero padding pointing at the padding bond
+        graph_a2b = graph.a2b[1:]
+        graph_a2b = torch.where(graph_a2b == 0, graph_a2b, graph_a2b + bond_offset)
+        a2b.append(torch.cat((graph_a2b, graph_a2b.new_zeros((graph_a2b.size(0),
+                                                              merged.max_num_bonds - graph.max_num_bonds))), dim=1))
+        b2a.append(graph.b2a[1:] + atom_offset)
+        b2revb.append(graph.b2revb[1:] + bond_offset)
+        a2mol.append(graph.a2mol + mol_offset)
+        a_sizes.append(graph.a_sizes)
+
+        merged.a_scope.extend((start + atom_offset, size) for start, size in graph.a_scope)
+        merged.b_scope.extend((start + bond_offset, size) for start, size in graph.b_scope)
+        merged.n_atoms += graph.n_atoms - 1
+        merged.n_bonds += graph.n_bonds - 1
+
+    merged.f_atoms = torch.cat(f_atoms, dim=0)
+    merged.f_bonds = torch.cat(f_bonds, dim=0)
+    merged.a2b = torch.cat(a2b, dim=0)
+    merged.b2a = torch.cat(b2a, dim=0)
+    merged.b2revb = torch.cat(b2revb, dim=0)
+    merged.b2b = None
+    merged.a2a = None
+    merged.a2mol = torch.cat(a2mol, dim=0)
+    merged.a_sizes = torch.cat(a_sizes, dim=0)
+
+    return merged
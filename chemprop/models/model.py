@@ -4,6 +4,7 @@ import numpy as np
 from rdkit import Chem
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 from .mpn import MPN
 from chemprop.args import TrainArgs
@@ -11,6 +12,12 @@ from chemprop.features import BatchMolGraph
 from chemprop.nn_utils import get_activation_function, initialize_weights
 
 
+INFERENCE_DTYPES = {
+    'bf16': torch.bfloat16,
+    'fp16': torch.float16,
+}
+
+
 class MoleculeModel(nn.Module):
     """A :class:`MoleculeModel` is a model which contains a message passing network following by feed-forward layers."""
 
@@ -26,20 +33,15 @@ class MoleculeModel(nn.Module):
         self.classification = args.dataset_type == 'classification'
         self.multiclass = args.dataset_type == 'multiclass'
         self.featurizer = featurizer
+        # Inference-only settings, which are left off during training and set from the PredictArgs by make_predictions
+        self.inference_precision = 'fp32'
+        self.cuda_graphs = False
+        self._ffn_graphs = {}
         
-        try:
-            self.output_size = args.output_size
-        except:
-            self.output_size = args.num_tasks
+        self.output_size = getattr(args, 'output_size', args.num_tasks)
         if self.multiclass:
             self.output_size *= args.multiclass_num_classes
 
-        if self.classification:
-            self.sigmoid = nn.Sigmoid()
-
-        if self.multiclass:
-            self.multiclass_softmax = nn.Softmax(dim=2)
-
         self.create_encoder(args)
         
         if type(args.ffn_hidden_size) is tuple:
@@ -47,8 +49,20 @@ class MoleculeModel(nn.Module):
         else:
             self.create_ffn(args)
 
+        # A single-layer FFN is just dropout followed by a linear layer, which forward applies
+        # functionally rather than through nn.Sequential (unless the FFN is compiled)
+        self._ffn_is_single = args.ffn_num_layers == 1 and not args.torch_compile
+
+        # Layers used by featurize, cached so that self.ffn[:-1] isn't rebuilt on every call.
+        # Stored as a plain tuple so the layers aren't registered (and saved) a second time.
+        self._ffn_without_last_layer = tuple(self.ffn)[:-1]
+
         initialize_weights(self)
 
+        # Compile in place so that parameter names (and therefore checkpoints) are unchanged
+        if args.torch_compile:
+            self.ffn.compile()
+
     def create_encoder(self, args: TrainArgs) -> None:
         """
         Creates the message passing encoder for the model.
@@ -153,6 +167,66 @@ class MoleculeModel(nn.Module):
         # Create FFN model
         self.ffn = nn.Sequential(*ffn)
 
+    def _apply(self, *args, **kwargs):
+        # Captured CUDA graphs point at the current parameter memory, so drop them when the model is moved or cast.
+        # The arguments are forwarded as is since their signature differs between PyTorch versions.
+        self._ffn_graphs = {}
+
+        return super(MoleculeModel, self)._apply(*args, **kwargs)
+
+    def run_ffn(self, encoding: torch.FloatTensor) -> torch.FloatTensor:
+        """
+        Runs the feed-forward layers, replaying a CUDA graph during inference if :code:`cuda_graphs` is enabled.
+
+        :param encoding: The output of the encoder.
+        :return: The output of the feed-forward layers.
+        """
+        if self.cuda_graphs and not self.training and encoding.is_cuda and not torch.is_grad_enabled():
+            return self.run_ffn_cuda_graph(encoding)
+
+        if self._ffn_is_single:
+            dropout, linear = self.ffn
+            return F.linear(F.dropout(encoding, p=dropout.p, training=self.training), linear.weight, linear.bias)
+
+        return self.ffn(encoding)
+
+    def run_ffn_cuda_graph(self, encoding: torch.FloatTensor) -> torch.FloatTensor:
+        """
+        Runs the feed-forward layers by replaying a CUDA graph captured for the shape of the input.
+
+        A graph is captured the first time each input shape is seen. This should only be used
+        during inference since the captured graph does not record gradients.
+
+        :param encoding: A CUDA tensor containing the output of the encoder.
+        :return: The output of the feed-forward layers.
+        """
+        key = (tuple(encoding.shape), encoding.dtype, self.inference_precision)
+
+        if key not in self._ffn_graphs:
+            static_input = encoding.clone()
+
+            # Warm up on a side stream before capturing, as required by CUDA graphs
+            current_stream = torch.cuda.current_stream(encoding.device)
+            side_stream = torch.cuda.Stream(device=encoding.device)
+            side_stream.wait_stream(current_stream)
+            with torch.cuda.stream(side_stream):
+                for _ in range(3):
+                    self.ffn(static_input)
+            current_stream.wait_stream(side_stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                static_output = self.ffn(static_input)
+
+            self._ffn_graphs[key] = (graph, static_input, static_output)
+
+        graph, static_input, static_output = self._ffn_graphs[key]
+        static_input.copy_(encoding)
+        graph.replay()
+
+        # Clone since the static output is overwritten by the next replay
+        return static_output.clone()
+
     def featurize(self,
                   batch: Union[List[str], List[Chem.Mol], BatchMolGraph],
                   features_batch: List[np.ndarray] = None,
@@ -170,8 +244,13 @@ class MoleculeModel(nn.Module):
         :param bond_features_batch: A list of numpy arrays containing additional bond features.
         :return: The feature vectors computed by the :class:`MoleculeModel`.
         """
-        return self.ffn[:-1](self.encoder(batch, features_batch, atom_descriptors_batch,
-                                          atom_features_batch, bond_features_batch))
+        output = self.encoder(batch, features_batch, atom_descriptors_batch,
+                              atom_features_batch, bond_features_batch)
+
+        for layer in self._ffn_without_last_layer:
+            output = layer(output)
+
+        return output
 
     def fingerprint(self,
                   batch: Union[List[str], List[Chem.Mol], BatchMolGraph],
@@ -211,15 +290,27 @@ class MoleculeModel(nn.Module):
             return self.featurize(batch, features_batch, atom_descriptors_batch,
                                   atom_features_batch, bond_features_batch)
 
-        output = self.ffn(self.encoder(batch, features_batch, atom_descriptors_batch,
-                                       atom_features_batch, bond_features_batch))
+        if not self.training and self.inference_precision != 'fp32' and self.ffn[-1].weight.is_cuda:
+            # The autocast weight cache is disabled since it breaks graph capture and the FFN weights are only used once
+            with torch.autocast('cuda', dtype=INFERENCE_DTYPES[self.inference_precision], cache_enabled=False):
+                encoding = self.encoder(batch, features_batch, atom_descriptors_batch,
+                                        atom_features_batch, bond_features_batch)
+                output = self.run_ffn(encoding)
+
+            # Upcast before the sigmoid/softmax so the probabilities are computed in full precision
+            output = output.float()
+        else:
+            encoding = self.encoder(batch, features_batch, atom_descriptors_batch,
+                                    atom_features_batch, bond_features_batch)
+            output = self.run_ffn(encoding)
 
         # Don't apply sigmoid during training b/c using BCEWithLogitsLoss
+        # The FFN output is a fresh tensor, so the sigmoid can be applied in place without an extra allocation
         if self.classification and not self.training:
-            output = self.sigmoid(output)
+            output = output.sigmoid_()
         if self.multiclass:
-            output = output.reshape((output.size(0), -1, self.num_classes))  # batch size x num targets x num classes per target
+            output = output.view((output.size(0), -1, self.num_classes))  # batch size x num targets x num classes per target
             if not self.training:
-                output = self.multiclass_softmax(output)  # to get probabilities during evaluation, but not during training as we're using CrossEntropyLoss
+                output = torch.softmax(output, dim=2)  # to get probabilities during evaluation, but not during training as we're using CrossEntropyLoss
 
         return output
@@ -1,5 +1,4 @@
 from typing import List, Union
-from functools import reduce
 
 import numpy as np
 from rdkit import Chem
@@ -7,8 +6,8 @@ import torch
 import torch.nn as nn
 
 from chemprop.args import TrainArgs
-from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph
-from chemprop.nn_utils import index_select_ND, get_activation_function
+from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, merge_batch_mol_graphs, mol2graph
+from chemprop.nn_utils import deterministic_algorithms_enabled, index_select_ND, index_sum, get_activation_function
 
 
 class MPNEncoder(nn.Module):
@@ -30,7 +29,6 @@ class MPNEncoder(nn.Module):
         self.dropout = args.dropout
         self.layers_per_message = 1
         self.undirected = args.undirected
-        self.device = args.device
         self.aggregation = args.aggregation
         self.aggregation_norm = args.aggregation_norm
 
@@ -40,8 +38,9 @@ class MPNEncoder(nn.Module):
         # Activation
         self.act_func = get_activation_function(args.activation)
 
-        # Cached zeros
-        self.cached_zero_vector = nn.Parameter(torch.zeros(self.hidden_size), requires_grad=False)
+        # No longer used by the readout, but kept (as a buffer, which isn't optimized) so that
+        # the state dicts of new models still match older checkpoints, which contain this key
+        self.register_buffer('cached_zero_vector', torch.zeros(self.hidden_size))
 
         # Input
         input_dim = self.atom_fdim if self.atom_messages else self.bond_fdim
@@ -74,15 +73,36 @@ class MPNEncoder(nn.Module):
         :param atom_descriptors_batch: A list of numpy arrays containing additional atomic descriptors
         :return: A PyTorch tensor of shape :code:`(num_molecules, hidden_size)` containing the encoding of each molecule.
         """
+        # Follow the parameters so the encoder keeps working after being moved with .to()
+        device = self.W_i.weight.device
+
         if atom_descriptors_batch is not None:
-            atom_descriptors_batch = [np.zeros([1, atom_descriptors_batch[0].shape[1]])] + atom_descriptors_batch   # padding the first with 0 to match the atom_hiddens
-            atom_descriptors_batch = torch.from_numpy(np.concatenate(atom_descriptors_batch, axis=0)).float().to(self.device)
+            # Concatenate the descriptors of all molecules straight into one float tensor, leaving the first row
+            # as zero padding to match the atom_hiddens, so that there is a single host-to-device transfer
+            num_atoms = sum(len(descriptors) for descriptors in atom_descriptors_batch)
+            atom_descriptors = torch.zeros((1 + num_atoms, atom_descriptors_batch[0].shape[1]))
+            np.concatenate(atom_descriptors_batch, axis=0, out=atom_descriptors.numpy()[1:])
+            atom_descriptors_batch = atom_descriptors.to(device)
 
         f_atoms, f_bonds, a2b, b2a, b2revb, a_scope, b_scope = mol_graph.get_components(atom_messages=self.atom_messages)
-        f_atoms, f_bonds, a2b, b2a, b2revb = f_atoms.to(self.device), f_bonds.to(self.device), a2b.to(self.device), b2a.to(self.device), b2revb.to(self.device)
-
-        if self.atom_messages:
-            a2a = mol_graph.get_a2a().to(self.device)
+        # The graph tensors are pinned when loaded by a MoleculeDataLoader with pin_memory=True,
+        # in which case these copies don't block the host
+        f_atoms, f_bonds, a2b, b2a, b2revb = (tensor.to(device, non_blocking=True)
+                                              for tensor in (f_atoms, f_bonds, a2b, b2a, b2revb))
+
+        a2mol = mol_graph.get_a2mol().to(device, non_blocking=True)
+        a_sizes = mol_graph.a_sizes.to(device, non_blocking=True)
+
+        # Without bias, the messages of the padding atom/bond are zero, so instead of gathering the zero-padded
+        # neighbors of each atom and summing them, each bond's message can be summed straight into the atom the bond
+        # points to. This avoids materializing a num_atoms x max_num_bonds x hidden tensor. However, index_add_ uses
+        # atomic adds on a GPU, which aren't reproducible, so the gathers are used when determinism is requested.
+        deterministic = deterministic_algorithms_enabled()
+        scatter = not self.bias and not deterministic
+        if scatter:
+            b2tgt = b2a[b2revb]  # num_bonds, the atom each bond points to
+        elif self.atom_messages:
+            a2a = mol_graph.get_a2a().to(device, non_blocking=True)
 
         # Input
         if self.atom_messages:
@@ -91,12 +111,19 @@ class MPNEncoder(nn.Module):
             input = self.W_i(f_bonds)  # num_bonds x hidden_size
         message = self.act_func(input)  # num_bonds x hidden_size
 
+        # The input (with W_h's bias folded in once) is added by the same addmm as W_h in each step
+        # rather than in a separate elementwise pass over the messages
+        input_plus_bias = input + self.W_h.bias if self.bias else input
+
         # Message passing
         for depth in range(self.depth - 1):
             if self.undirected:
                 message = (message + message[b2revb]) / 2
 
-            if self.atom_messages:
+            if self.atom_messages and scatter:
+                nei_message = torch.cat((message[b2a], f_bonds), dim=1)  # num_bonds x hidden + bond_fdim
+                message = index_sum(nei_message, b2tgt, len(f_atoms))  # num_atoms x hidden + bond_fdim
+            elif self.atom_messages:
                 nei_a_message = index_select_ND(message, a2a)  # num_atoms x max_num_bonds x hidden
                 nei_f_bonds = index_select_ND(f_bonds, a2b)  # num_atoms x max_num_bonds x bond_fdim
                 nei_message = torch.cat((nei_a_message, nei_f_bonds), dim=2)  # num_atoms x max_num_bonds x hidden + bond_fdim
@@ -104,18 +131,25 @@ class MPNEncoder(nn.Module):
             else:
                 # m(a1 -> a2) = [sum_{a0 \in nei(a1)} m(a0 -> a1)] - m(a2 -> a1)
                 # message      a_message = sum(nei_a_message)      rev_message
-                nei_a_message = index_select_ND(message, a2b)  # num_atoms x max_num_bonds x hidden
-                a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
+                if scatter:
+                    a_message = index_sum(message, b2tgt, len(f_atoms))  # num_atoms x hidden
+                else:
+                    nei_a_message = index_select_ND(message, a2b)  # num_atoms x max_num_bonds x hidden
+                    a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
                 rev_message = message[b2revb]  # num_bonds x hidden
                 message = a_message[b2a] - rev_message  # num_bonds x hidden
 
-            message = self.W_h(message)
-            message = self.act_func(input + message)  # num_bonds x hidden_size
+            message = torch.addmm(input_plus_bias, message, self.W_h.weight.t())  # num_bonds x hidden_size
+            message = self.act_func(message)  # num_bonds x hidden_size
             message = self.dropout_layer(message)  # num_bonds x hidden
 
-        a2x = a2a if self.atom_messages else a2b
-        nei_a_message = index_select_ND(message, a2x)  # num_atoms x max_num_bonds x hidden
-        a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
+        if scatter:
+            b_message = message[b2a] if self.atom_messages else message  # num_bonds x hidden
+            a_message = index_sum(b_message, b2tgt, len(f_atoms))  # num_atoms x hidden
+        else:
+            a2x = a2a if self.atom_messages else a2b
+            nei_a_message = index_select_ND(message, a2x)  # num_atoms x max_num_bonds x hidden
+            a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
         a_input = torch.cat([f_atoms, a_message], dim=1)  # num_atoms x (atom_fdim + hidden)
         atom_hiddens = self.act_func(self.W_o(a_input))  # num_atoms x hidden
         atom_hiddens = self.dropout_layer(atom_hiddens)  # num_atoms x hidden
@@ -130,22 +164,21 @@ class MPNEncoder(nn.Module):
             atom_hiddens = self.dropout_layer(atom_hiddens)                             # num_atoms x (hidden + descriptor size)
 
         # Readout
-        mol_vecs = []
-        for i, (a_start, a_size) in enumerate(a_scope):
-            if a_size == 0:
-                mol_vecs.append(self.cached_zero_vector)
-            else:
-                cur_hiddens = atom_hiddens.narrow(0, a_start, a_size)
-                mol_vec = cur_hiddens  # (num_atoms, hidden_size)
-                if self.aggregation == 'mean':
-                    mol_vec = mol_vec.sum(dim=0) / a_size
-                elif self.aggregation == 'sum':
-                    mol_vec = mol_vec.sum(dim=0)
-                elif self.aggregation == 'norm':
-                    mol_vec = mol_vec.sum(dim=0) / self.aggregation_norm
-                mol_vecs.append(mol_vec)
-
-        mol_vecs = torch.stack(mol_vecs, dim=0)  # (num_molecules, hidden_size)
+        # The molecules' atoms are contiguous and follow the padding atom, so the atom hiddens of all molecules
+        # can be summed with a single index_add_ keyed by the molecule index of each atom (unless determinism
+        # is requested, in which case each molecule is summed separately)
+        if deterministic:
+            mol_vecs = torch.stack([atom_hiddens.narrow(0, a_start, a_size).sum(dim=0)
+                                    for a_start, a_size in a_scope])  # (num_molecules, hidden_size)
+        else:
+            mol_vecs = atom_hiddens.new_zeros((a_sizes.size(0), atom_hiddens.size(1)))  # (num_molecules, hidden_size)
+            mol_vecs.index_add_(0, a2mol, atom_hiddens[1:])
+
+        # Molecules without atoms keep a zero vector
+        if self.aggregation == 'mean':
+            mol_vecs = mol_vecs / a_sizes.clamp(min=1).unsqueeze(1)
+        elif self.aggregation == 'norm':
+            mol_vecs = mol_vecs / self.aggregation_norm
 
         return mol_vecs  # num_molecules x hidden
 
@@ -169,6 +202,7 @@ class MPN(nn.Module):
                                                     atom_messages=args.atom_messages)
 
         self.features_only = args.features_only
+        self.mpn_shared = args.mpn_shared
         self.use_input_features = args.use_input_features
         self.device = args.device
         self.atom_descriptors = args.atom_descriptors
@@ -184,6 +218,12 @@ class MPN(nn.Module):
             self.encoder = nn.ModuleList([MPNEncoder(args, self.atom_fdim, self.bond_fdim)
                                           for _ in range(args.number_of_molecules)])
 
+        # Compile in place so that parameter names (and therefore checkpoints) are unchanged. The number of atoms
+        # and bonds changes with every batch, so compile with dynamic shapes to avoid recompiling for each batch.
+        if args.torch_compile:
+            for encoder in set(self.encoder):
+                encoder.compile(dynamic=True)
+
     def forward(self,
                 batch: Union[List[List[str]], List[List[Chem.Mol]], List[BatchMolGraph]],
                 features_batch: List[np.ndarray] = None,
@@ -197,7 +237,8 @@ class MPN(nn.Module):
                       list of :class:`~chemprop.features.featurization.BatchMolGraph`.
                       The outer list is of length :code:`number_of_molecules` (number of molecules per datapoint), 
                       the inner list or BatchMolGraph is of length :code:`num_molecules` (number of datapoints in batch).
-        :param features_batch: A list of numpy arrays containing additional features.
+        :param features_batch: A list of numpy arrays containing additional features
+                               (or a PyTorch tensor with the features already stacked).
         :param atom_descriptors_batch: A list of numpy arrays containing additional atom descriptors.
         :param atom_features_batch: A list of numpy arrays containing additional atom features.
         :param bond_features_batch: A list of numpy arrays containing additional bond features.
@@ -227,10 +268,11 @@ class MPN(nn.Module):
                 batch = [mol2graph(b) for b in batch]
 
         if self.use_input_features:
-            features_batch = torch.from_numpy(np.stack(features_batch)).float().to(self.device)
+            if not isinstance(features_batch, torch.Tensor):
+                features_batch = torch.from_numpy(np.stack(features_batch)).float()
 
             if self.features_only:
-                return features_batch
+                return features_batch.to(self.device)
 
         if self.atom_descriptors == 'descriptor':
             if len(batch) > 1:
@@ -238,15 +280,24 @@ class MPN(nn.Module):
                                           'per input (i.e., number_of_molecules = 1).')
 
             encodings = [enc(ba, atom_descriptors_batch) for enc, ba in zip(self.encoder, batch)]
+        elif self.mpn_shared and len(batch) > 1:
+            # The encoder is shared across molecules, so encode all of them in a single pass
+            # and split the molecule vectors back up by position in the input
+            encodings = list(torch.split(self.encoder[0](merge_batch_mol_graphs(batch)), len(batch[0].a_scope)))
         else:
             encodings = [enc(ba) for enc, ba in zip(self.encoder, batch)]
 
-        output = reduce(lambda x, y: torch.cat((x, y), dim=1), encodings)
-
         if self.use_input_features:
+            # Follow the encoders (rather than args.device) so the features end up on the same device as
+            # the encodings even if the model has been moved since it was built
+            features_batch = features_batch.to(encodings[0].device)
+
             if len(features_batch.shape) == 1:
                 features_batch = features_batch.view(1, -1)
 
-            output = torch.cat([output, features_batch], dim=1)
+            encodings.append(features_batch)
+
+        # Concatenate everything in a single call rather than pairwise to avoid intermediate allocations
+        output = encodings[0] if len(encodings) == 1 else torch.cat(encodings, dim=1)
 
         return output
@@ -61,6 +61,35 @@ def index_select_ND(source: torch.Tensor, index: torch.Tensor) -> torch.Tensor:
     return target
 
 
+def deterministic_algorithms_enabled() -> bool:
+    """
+    Determines whether PyTorch has been asked to use only deterministic algorithms.
+
+    :return: Whether deterministic algorithms are enabled (always False on versions of PyTorch without the setting).
+    """
+    if hasattr(torch, 'are_deterministic_algorithms_enabled'):
+        return torch.are_deterministic_algorithms_enabled()
+
+    return hasattr(torch, 'is_deterministic') and torch.is_deterministic()
+
+
+def index_sum(source: torch.Tensor, index: torch.Tensor, num_rows: int) -> torch.Tensor:
+    """
+    Sums the message features in source into the atom or bond indices in :code:`index`.
+
+    This is equivalent to gathering the padded neighbors of each atom/bond with :meth:`index_select_ND` and summing
+    over them when the padding features are zero, but it doesn't materialize the padded neighbor tensor.
+    On a GPU, the sum uses atomic adds, so its result is not bitwise reproducible from run to run.
+
+    :param source: A tensor of shape :code:`(num_bonds, hidden_size)` containing message features.
+    :param index: A tensor of shape :code:`(num_bonds,)` containing the atom or bond index into which
+                  each row of :code:`source` is summed.
+    :param num_rows: The number of atoms/bonds in the output.
+    :return: A tensor of shape :code:`(num_atoms/num_bonds, hidden_size)` containing the summed message features.
+    """
+    return source.new_zeros((num_rows,) + source.size()[1:]).index_add_(0, index, source)
+
+
 def get_activation_function(activation: str) -> nn.Module:
     """
     Gets an activation function module given the name of the activation.
@@ -74,7 +74,8 @@ def make_predictions(args: PredictArgs, smiles: List[List[str]] = None) -> List[
     test_data_loader = MoleculeDataLoader(
         dataset=test_data,
         batch_size=args.batch_size,
-        num_workers=args.num_workers
+        num_workers=args.num_workers,
+        pin_memory=args.cuda
     )
 
     # Partial results for variance robust calculation.
@@ -85,6 +86,8 @@ def make_predictions(args: PredictArgs, smiles: List[List[str]] = None) -> List[
     for index, checkpoint_path in enumerate(tqdm(args.checkpoint_paths, total=len(args.checkpoint_paths))):
         # Load model and scalers
         model = load_checkpoint(checkpoint_path, device=args.device)
+        model.inference_precision = args.inference_precision
+        model.cuda_graphs = args.cuda_graphs
         scaler, features_scaler, atom_descriptor_scaler, bond_feature_scaler = load_scalers(checkpoint_path)
 
         # Normalize features
@@ -66,6 +66,8 @@ def molecule_fingerprint(args: PredictArgs, smiles: List[List[str]] = None) -> L
     print(f'Encoding smiles into a fingerprint vector from a single model')
     if len(args.checkpoint_paths) != 1:
         raise ValueError("Fingerprint generation only supports one model, cannot use an ensemble")
+    if args.inference_precision != 'fp32' or args.cuda_graphs:
+        raise ValueError("Fingerprint generation does not support --inference_precision or --cuda_graphs")
 
     model = load_checkpoint(args.checkpoint_paths[0], device=args.device)
     scaler, features_scaler, atom_descriptor_scaler, bond_feature_scaler = load_scalers(args.checkpoint_paths[0])
@@ -123,6 +125,8 @@ def model_fingerprint(model: MoleculeModel,
     """
     model.eval()
 
+    # Each batch of fingerprints is copied to the host without blocking (into pinned memory on a GPU), so the host
+    # can go ahead and prepare the next batch. The copies are waited on once after the loop.
     fingerprints = []
 
     for batch in tqdm(data_loader, disable=disable_progress_bar, leave=False):
@@ -135,11 +139,15 @@ def model_fingerprint(model: MoleculeModel,
             batch_fp = model.fingerprint(mol_batch, features_batch, atom_descriptors_batch)
 
         # Collect vectors
-        batch_fp = batch_fp.data.cpu().tolist()
+        fingerprints.append(batch_fp.to('cpu', non_blocking=True))
 
-        fingerprints.extend(batch_fp)
+    if len(fingerprints) == 0:
+        return []
 
-    return fingerprints
+    if batch_fp.is_cuda:
+        torch.cuda.current_stream(batch_fp.device).synchronize()
+
+    return [fp for fps in fingerprints for fp in fps.tolist()]
 
 def chemprop_fingerprint() -> None:
     """
@@ -22,6 +22,8 @@ def predict(model: MoleculeModel,
     """
     model.eval()
 
+    # Each batch of predictions is copied to the host without blocking (into pinned memory on a GPU), so the host
+    # can go ahead and prepare the next batch. The copies are waited on once after the loop.
     preds = []
 
     for batch in tqdm(data_loader, disable=disable_progress_bar, leave=False):
@@ -35,14 +37,19 @@ def predict(model: MoleculeModel,
             batch_preds = model(mol_batch, features_batch, atom_descriptors_batch,
                                 atom_features_batch, bond_features_batch)
 
-        batch_preds = batch_preds.data.cpu().numpy()
+        # Collect vectors
+        preds.append(batch_preds.to('cpu', non_blocking=True))
 
-        # Inverse scale if regression
-        if scaler is not None:
-            batch_preds = scaler.inverse_transform(batch_preds)
+    if len(preds) == 0:
+        return []
 
-        # Collect vectors
-        batch_preds = batch_preds.tolist()
-        preds.extend(batch_preds)
+    if batch_preds.is_cuda:
+        torch.cuda.current_stream(batch_preds.device).synchronize()
+
+    preds = torch.cat(preds, dim=0).numpy()
+
+    # Inverse scale if regression
+    if scaler is not None:
+        preds = scaler.inverse_transform(preds)
 
-    return preds
+    return preds.tolist()
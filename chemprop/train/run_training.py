@@ -162,23 +162,29 @@ def run_training(args: TrainArgs,
         num_workers = args.num_workers
 
     # Create data loaders
+    # The data is no longer modified at this point, so the training workers can be kept alive across epochs
+    # (the validation and test loaders are iterated too rarely to be worth keeping extra processes alive)
     train_data_loader = MoleculeDataLoader(
         dataset=train_data,
         batch_size=args.batch_size,
         num_workers=num_workers,
         class_balance=args.class_balance,
         shuffle=True,
-        seed=args.seed
+        seed=args.seed,
+        persistent_workers=True,
+        pin_memory=args.cuda
     )
     val_data_loader = MoleculeDataLoader(
         dataset=val_data,
         batch_size=args.batch_size,
-        num_workers=num_workers
+        num_workers=num_workers,
+        pin_memory=args.cuda
     )
     test_data_loader = MoleculeDataLoader(
         dataset=test_data,
         batch_size=args.batch_size,
-        num_workers=num_workers
+        num_workers=num_workers,
+        pin_memory=args.cuda
     )
 
     if args.class_balance:
@@ -63,7 +63,8 @@ def train(model: MoleculeModel,
 
         if args.dataset_type == 'multiclass':
             targets = targets.long()
-            loss = torch.cat([loss_func(preds[:, target_index, :], targets[:, target_index]).unsqueeze(1) for target_index in range(preds.size(1))], dim=1) * class_weights * mask
+            # CrossEntropyLoss takes the classes in dim 1, so all targets are handled in one call
+            loss = loss_func(preds.transpose(1, 2), targets) * class_weights * mask  # batch size x num targets
         else:
             loss = loss_func(preds, targets) * class_weights * mask
         loss = loss.sum() / mask.sum()
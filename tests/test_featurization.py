@@ -0,0 +1,134 @@
+"""Chemprop featurization tests."""
+from typing import List, Tuple
+import unittest
+from unittest import TestCase
+
+from parameterized import parameterized
+import torch
+
+from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, merge_batch_mol_graphs, MolGraph
+from chemprop.nn_utils import index_select_ND, index_sum
+
+
+SMILES_BATCHES = [
+    ('ring', ['c1ccccc1', 'C1CC1C(=O)O']),
+    ('mixed', ['CCO', 'C', 'OCC3OC(OCC2OC(OC(C#N)c1ccccc1)C(O)C(O)C2O)C(O)C(O)C3O', '[Na+].[Cl-]', 'CC(C)(C)N']),
+    ('single_heavy_atoms', ['C', 'O', '[Na+]']),
+    ('empty_molecule', ['CCN', '', 'c1ccncc1']),
+]
+
+
+def reference_components(mol_graphs: List[MolGraph]) -> Tuple[torch.FloatTensor, torch.FloatTensor,
+                                                               torch.LongTensor, torch.LongTensor, torch.LongTensor,
+                                                               List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """Builds the components of a :class:`BatchMolGraph` with the original per-atom and per-bond Python loops."""
+    n_atoms, n_bonds = 1, 1
+    a_scope, b_scope = [], []
+    f_atoms = [[0] * get_atom_fdim()]
+    f_bonds = [[0] * get_bond_fdim()]
+    a2b, b2a, b2revb = [[]], [0], [0]
+    for mol_graph in mol_graphs:
+        f_atoms.extend(mol_graph.f_atoms)
+        f_bonds.extend(mol_graph.f_bonds)
+
+        for a in range(mol_graph.n_atoms):
+            a2b.append([b + n_bonds for b in mol_graph.a2b[a]])
+
+        for b in range(mol_graph.n_bonds):
+            b2a.append(n_atoms + mol_graph.b2a[b])
+            b2revb.append(n_bonds + mol_graph.b2revb[b])
+
+        a_scope.append((n_atoms, mol_graph.n_atoms))
+        b_scope.append((n_bonds, mol_graph.n_bonds))
+        n_atoms += mol_graph.n_atoms
+        n_bonds += mol_graph.n_bonds
+
+    max_num_bonds = max(1, max(len(in_bonds) for in_bonds in a2b))
+
+    return (torch.FloatTensor(f_atoms), torch.FloatTensor(f_bonds),
+            torch.LongTensor([a2b[a] + [0] * (max_num_bonds - len(a2b[a])) for a in range(n_atoms)]),
+            torch.LongTensor(b2a), torch.LongTensor(b2revb), a_scope, b_scope)
+
+
+def reference_b2b(mol_graph: BatchMolGraph) -> torch.LongTensor:
+    """Builds the bond to incoming bond mapping with the original reverse-bond mask."""
+    b2b = mol_graph.a2b[mol_graph.b2a]
+    revmask = (b2b != mol_graph.b2revb.unsqueeze(1).repeat(1, b2b.size(1))).long()
+
+    return b2b * revmask
+
+
+def shape_and_dtype(tensor: torch.Tensor) -> Tuple[Tuple[int, ...], torch.dtype]:
+    """Returns the shape and dtype of a tensor so that they can be compared in a single assertion."""
+    return tuple(tensor.shape), tensor.dtype
+
+
+def assert_graphs_equal(test: TestCase, graph: BatchMolGraph, expected: BatchMolGraph) -> None:
+    """Asserts that two :class:`BatchMolGraph`\\ s have the same attributes with the same values."""
+    test.assertEqual(set(vars(graph)), set(vars(expected)))
+
+    for name, value in vars(expected).items():
+        with test.subTest(attribute=name):
+            if isinstance(value, torch.Tensor):
+                test.assertEqual(shape_and_dtype(getattr(graph, name)), shape_and_dtype(value))
+                test.assertTrue(torch.equal(getattr(graph, name), value))
+            else:
+                test.assertEqual(getattr(graph, name), value)
+
+
+class FeaturizationTests(TestCase):
+    @parameterized.expand(SMILES_BATCHES)
+    def test_batch_mol_graph_matches_reference(self, name: str, smiles: List[str]):
+        mol_graphs = [MolGraph(s) for s in smiles]
+        components = BatchMolGraph(mol_graphs).get_components()
+        expected_components = reference_components(mol_graphs)
+
+        for component, expected_component, component_name in zip(
+                components, expected_components, ['f_atoms', 'f_bonds', 'a2b', 'b2a', 'b2revb', 'a_scope', 'b_scope']):
+            with self.subTest(component=component_name):
+                if isinstance(expected_component, torch.Tensor):
+                    self.assertEqual(shape_and_dtype(component), shape_and_dtype(expected_component))
+                    self.assertTrue(torch.equal(component, expected_component))
+                else:
+                    self.assertEqual(component, expected_component)
+
+    @parameterized.expand(SMILES_BATCHES)
+    def test_get_b2b_matches_reference(self, name: str, smiles: List[str]):
+        mol_graph = BatchMolGraph([MolGraph(s) for s in smiles])
+        self.assertTrue(torch.equal(mol_graph.get_b2b(), reference_b2b(mol_graph)))
+
+    @parameterized.expand(SMILES_BATCHES)
+    def test_get_a2mol(self, name: str, smiles: List[str]):
+        mol_graph = BatchMolGraph([MolGraph(s) for s in smiles])
+        expected = [mol_index for mol_index, (_, a_size) in enumerate(mol_graph.a_scope) for _ in range(a_size)]
+        self.assertEqual(mol_graph.get_a2mol().tolist(), expected)
+        self.assertEqual(mol_graph.a_sizes.tolist(), [a_size for _, a_size in mol_graph.a_scope])
+
+    @parameterized.expand([
+        ('two_graphs', [['c1ccccc1', 'CCO'], ['C', 'CC(=O)N']]),
+        ('three_graphs', [['CCO', ''], ['c1ccncc1', '[Na+].[Cl-]'], ['C', 'O']]),
+        ('different_max_num_bonds', [['C', 'O'], ['CC(C)(C)C', 'CCO']]),
+    ])
+    def test_merge_batch_mol_graphs_matches_single_batch(self, name: str, smiles_batches: List[List[str]]):
+        batch_graphs = [BatchMolGraph([MolGraph(s) for s in smiles]) for smiles in smiles_batches]
+        merged = merge_batch_mol_graphs(batch_graphs)
+        expected = BatchMolGraph([MolGraph(s) for smiles in smiles_batches for s in smiles])
+
+        # merge_batch_mol_graphs bypasses __init__, so this also checks that it sets every attribute
+        assert_graphs_equal(self, merged, expected)
+
+    @parameterized.expand(SMILES_BATCHES)
+    def test_index_sum_matches_padded_gather(self, name: str, smiles: List[str]):
+        mol_graph = BatchMolGraph([MolGraph(s) for s in smiles])
+        _, _, a2b, b2a, b2revb, _, _ = mol_graph.get_components()
+
+        torch.manual_seed(0)
+        message = torch.randn(mol_graph.n_bonds, 8)
+        message[0] = 0  # the padding bond message
+
+        expected = index_select_ND(message, a2b).sum(dim=1)
+        self.assertTrue(torch.allclose(index_sum(message, b2a[b2revb], mol_graph.n_atoms), expected, atol=1e-6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Chemprop model tests."""
+import os
+import unittest
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+import torch
+
+from chemprop.args import TrainArgs
+from chemprop.features import BatchMolGraph, MolGraph
+from chemprop.models import MoleculeModel
+
+
+TEST_DATA_DIR = 'tests/data'
+SMILES = ['c1ccccc1', 'CCO', 'C', 'CC(C)(C)N']
+
+
+def create_model() -> MoleculeModel:
+    """Creates a small CPU model with reduced inference precision and CUDA graphs requested."""
+    args = TrainArgs().parse_args([
+        '--data_path', os.path.join(TEST_DATA_DIR, 'regression.csv'),
+        '--dataset_type', 'regression',
+        '--hidden_size', '16',
+        '--no_cuda',
+        '--quiet'
+    ])
+    args.task_names = ['logSolubility']
+
+    model = MoleculeModel(args)
+    model.inference_precision = 'bf16'
+    model.cuda_graphs = True
+
+    return model
+
+
+class MoleculeModelTests(TestCase):
+    @parameterized.expand([
+        ('eval_no_grad', False, False),
+        ('train_no_grad', True, False),
+        ('eval_grad', False, True),
+        ('train_grad', True, True),
+    ])
+    def test_forward_on_cpu_skips_autocast_and_cuda_graphs(self, name: str, training: bool, grad_enabled: bool):
+        torch.manual_seed(0)
+        model = create_model()
+        model.train(training)
+        batch = [BatchMolGraph([MolGraph(s) for s in SMILES])]
+
+        # create=True since torch.autocast doesn't exist before PyTorch 1.10
+        with patch('torch.autocast', create=True) as autocast, \
+                patch.object(MoleculeModel, 'run_ffn_cuda_graph') as run_ffn_cuda_graph, \
+                torch.set_grad_enabled(grad_enabled):
+            output = model(batch)
+
+        autocast.assert_not_called()
+        run_ffn_cuda_graph.assert_not_called()
+        self.assertEqual(output.shape, (len(SMILES), 1))
+        self.assertEqual(output.dtype, torch.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
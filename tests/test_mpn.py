@@ -0,0 +1,161 @@
+"""Chemprop message passing tests."""
+import os
+from typing import List
+import unittest
+from unittest import TestCase
+
+import numpy as np
+from parameterized import parameterized
+import torch
+
+from chemprop.args import TrainArgs
+from chemprop.features import BatchMolGraph, MolGraph
+from chemprop.models.mpn import MPN, MPNEncoder
+from chemprop.nn_utils import index_select_ND
+
+
+TEST_DATA_DIR = 'tests/data'
+SMILES = ['c1ccccc1', 'CCO', 'C', 'OCC3OC(OCC2OC(OC(C#N)c1ccccc1)C(O)C(O)C2O)C(O)C(O)C3O', '[Na+].[Cl-]',
+          'CC(C)(C)N', 'O=C(O)c1ccncc1']
+ATOM_DESCRIPTORS_SIZE = 3
+
+
+def create_args(flags: List[str] = None) -> TrainArgs:
+    """Creates small, dropout-free model arguments for testing the encoder."""
+    return TrainArgs().parse_args([
+        '--data_path', os.path.join(TEST_DATA_DIR, 'regression.csv'),
+        '--dataset_type', 'regression',
+        '--hidden_size', '16',
+        '--dropout', '0',
+        '--no_cuda',
+        '--quiet'
+    ] + (flags if flags is not None else []))
+
+
+def reference_encode(encoder: MPNEncoder,
+                     mol_graph: BatchMolGraph,
+                     atom_descriptors_batch: List[np.ndarray] = None) -> torch.FloatTensor:
+    """Encodes a batch with the original padded gathers, separate W_h and residual add, and per-molecule readout."""
+    f_atoms, f_bonds, a2b, b2a, b2revb, a_scope, _ = mol_graph.get_components(atom_messages=encoder.atom_messages)
+    a2a = b2a[a2b]
+
+    input = encoder.W_i(f_atoms if encoder.atom_messages else f_bonds)
+    message = encoder.act_func(input)
+
+    for _ in range(encoder.depth - 1):
+        if encoder.undirected:
+            message = (message + message[b2revb]) / 2
+
+        if encoder.atom_messages:
+            nei_message = torch.cat((index_select_ND(message, a2a), index_select_ND(f_bonds, a2b)), dim=2)
+            message = nei_message.sum(dim=1)
+        else:
+            a_message = index_select_ND(message, a2b).sum(dim=1)
+            message = a_message[b2a] - message[b2revb]
+
+        message = encoder.W_h(message)
+        message = encoder.act_func(input + message)
+
+    a_message = index_select_ND(message, a2a if encoder.atom_messages else a2b).sum(dim=1)
+    atom_hiddens = encoder.act_func(encoder.W_o(torch.cat([f_atoms, a_message], dim=1)))
+
+    if atom_descriptors_batch is not None:
+        atom_descriptors_batch = [np.zeros([1, atom_descriptors_batch[0].shape[1]])] + atom_descriptors_batch
+        atom_descriptors_batch = torch.from_numpy(np.concatenate(atom_descriptors_batch, axis=0)).float()
+        atom_hiddens = encoder.atom_descriptors_layer(torch.cat([atom_hiddens, atom_descriptors_batch], dim=1))
+
+    mol_vecs = []
+    for a_start, a_size in a_scope:
+        if a_size == 0:
+            mol_vecs.append(atom_hiddens.new_zeros(atom_hiddens.size(1)))
+        elif encoder.aggregation == 'mean':
+            mol_vecs.append(atom_hiddens.narrow(0, a_start, a_size).sum(dim=0) / a_size)
+        elif encoder.aggregation == 'sum':
+            mol_vecs.append(atom_hiddens.narrow(0, a_start, a_size).sum(dim=0))
+        else:
+            mol_vecs.append(atom_hiddens.narrow(0, a_start, a_size).sum(dim=0) / encoder.aggregation_norm)
+
+    return torch.stack(mol_vecs, dim=0)
+
+
+class MPNTests(TestCase):
+    def assert_matches_reference(self,
+                                 encoder: MPNEncoder,
+                                 smiles: List[str],
+                                 atom_descriptors_batch: List[np.ndarray] = None):
+        """Asserts that the encoder's outputs and gradients match those of :meth:`reference_encode`."""
+        mol_graph = BatchMolGraph([MolGraph(s) for s in smiles])
+        torch.manual_seed(0)
+
+        output = encoder(mol_graph, atom_descriptors_batch)
+        weights = torch.randn_like(output)
+        # W_h is unused with a depth of 1, so allow unused parameters (whose gradients are None)
+        grads = torch.autograd.grad((output * weights).sum(), list(encoder.parameters()), allow_unused=True)
+
+        expected = reference_encode(encoder, mol_graph, atom_descriptors_batch)
+        expected_grads = torch.autograd.grad((expected * weights).sum(), list(encoder.parameters()), allow_unused=True)
+
+        self.assertTrue(torch.allclose(output, expected, rtol=1e-4, atol=1e-5))
+        for (name, _), grad, expected_grad in zip(encoder.named_parameters(), grads, expected_grads):
+            with self.subTest(parameter=name):
+                if expected_grad is None:
+                    self.assertIsNone(grad)
+                else:
+                    self.assertTrue(torch.allclose(grad, expected_grad, rtol=1e-4, atol=1e-5))
+
+    @parameterized.expand([
+        (f'{messages}_{bias}_{undirected}_{aggregation}_depth_{depth}',
+         [flag for flag in (messages, bias, undirected) if flag] + ['--aggregation', aggregation, '--depth', str(depth)])
+        for messages in ('', '--atom_messages')
+        for bias in ('', '--bias')
+        for undirected in ('', '--undirected')
+        for aggregation in ('mean', 'sum', 'norm')
+        for depth in (1, 3)
+        if not (messages and undirected)
+    ])
+    def test_encoder_matches_reference(self, name: str, flags: List[str]):
+        torch.manual_seed(0)
+        encoder = MPN(create_args(flags)).encoder[0]
+
+        self.assert_matches_reference(encoder, SMILES + [''])
+
+        if hasattr(torch, 'use_deterministic_algorithms'):
+            torch.use_deterministic_algorithms(True)
+            try:
+                self.assert_matches_reference(encoder, SMILES + [''])
+            finally:
+                torch.use_deterministic_algorithms(False)
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+    ])
+    def test_encoder_with_atom_descriptors_matches_reference(self, name: str, flags: List[str]):
+        args = create_args(flags)
+        args.atom_descriptors = 'descriptor'
+        args.atom_descriptors_size = ATOM_DESCRIPTORS_SIZE
+        torch.manual_seed(0)
+        encoder = MPN(args).encoder[0]
+
+        rng = np.random.RandomState(0)
+        atom_descriptors_batch = [rng.randn(a_size, ATOM_DESCRIPTORS_SIZE)
+                                  for _, a_size in BatchMolGraph([MolGraph(s) for s in SMILES]).a_scope]
+
+        self.assert_matches_reference(encoder, SMILES, atom_descriptors_batch)
+
+    def test_shared_encoder_matches_separate_encodings(self):
+        args = create_args(['--mpn_shared'])
+        args.number_of_molecules = 2
+        torch.manual_seed(0)
+        mpn = MPN(args)
+
+        batch = [BatchMolGraph([MolGraph(s) for s in smiles]) for smiles in (SMILES, list(reversed(SMILES)))]
+        output = mpn(batch)
+        expected = torch.cat([mpn.encoder[0](mol_graph) for mol_graph in batch], dim=1)
+
+        self.assertEqual(output.shape, (len(SMILES), 2 * args.hidden_size))
+        self.assertTrue(torch.allclose(output, expected, rtol=1e-4, atol=1e-5))
+
+
+if __name__ == '__main__':
+    unittest.main()